@@ -0,0 +1,8 @@
+#!/usr/bin/env python
+
+import sys
+
+from terminfo import dump
+
+if __name__ == '__main__':
+    sys.exit(dump.main())
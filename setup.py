@@ -22,5 +22,5 @@ setup(
         'Topic :: Software Development :: Libraries :: Python Modules'
     ],
     keywords=['ncurses', 'terminfo', 'termcap'],
-    scripts=['py-terminfo-create-cache.py'],
+    scripts=['py-terminfo-create-cache.py', 'py-terminfo-dump.py'],
 )
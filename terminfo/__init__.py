@@ -1,2 +1,4 @@
 from terminfo.core import TermInfo  # noqa
 from terminfo.cap_info import *  # noqa
+from terminfo.registry import *  # noqa
+from terminfo.palette import Palette  # noqa
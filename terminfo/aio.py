@@ -0,0 +1,219 @@
+import asyncio
+import collections
+
+from terminfo import core
+from terminfo import cap_info as cap_info_mod
+from terminfo.registry import default_registry
+
+
+__all__ = ['load_terminfo', 'load_cap_info_async', 'KeyEvent', 'KeyDecoder',
+           'KeyReader']
+
+
+# loads in progress, so that concurrent requests for the same thing share a
+# single load: (loop id, key) --> future
+_pending = {}
+
+
+async def _run_once(key, func, *args, executor=None):
+    loop = asyncio.get_event_loop()
+    key = (id(loop), key)
+
+    fut = _pending.get(key)
+    if fut is None:
+        fut = loop.run_in_executor(executor, func, *args)
+        _pending[key] = fut
+        fut.add_done_callback(lambda _: _pending.pop(key, None))
+
+    # one caller getting cancelled shouldn't cancel the load for the others
+    return await asyncio.shield(fut)
+
+
+def _load_terminfo_sync(name, cap_info, dirs, registry, term_info_kwargs):
+    path = core.find_terminfo_file(name, dirs)
+    if path is None:
+        raise KeyError(name)
+
+    with open(path, 'rb') as f:
+        contents = f.read()
+
+    return core.TermInfo(contents, cap_info, registry=registry,
+                         **term_info_kwargs)
+
+
+# like TermInfoCache.get, except that the file I/O and the parsing (and
+# loading the capabilities table, if it's given by name) happen in an
+# executor, instead of blocking the event loop
+async def load_terminfo(name, cap_info, dirs=None, registry=None,
+                        executor=None, **term_info_kwargs):
+    if dirs is None:
+        dirs = core.terminfo_dirs()
+
+    if registry is None:
+        registry = default_registry
+
+    if isinstance(cap_info, str):
+        cap_info_key = cap_info
+    else:
+        cap_info_key = id(cap_info)
+
+    key = ('terminfo', name, cap_info_key, tuple(dirs), id(registry),
+           tuple(sorted(term_info_kwargs.items())))
+
+    return await _run_once(key, _load_terminfo_sync, name, cap_info,
+                           list(dirs), registry, term_info_kwargs,
+                           executor=executor)
+
+
+async def load_cap_info_async(caps_file=None, cache_file=None,
+                              use_term_h=False, executor=None):
+    key = ('cap_info', caps_file, cache_file, use_term_h)
+    return await _run_once(key, cap_info_mod.load_cap_info, caps_file,
+                           cache_file, use_term_h, executor=executor)
+
+
+# name is the name of the key capability (e.g. 'kcuu1' or 'key_up', depending
+# on whether the entry uses variable names), or None for ordinary input
+KeyEvent = collections.namedtuple('KeyEvent', ['name', 'data'])
+
+
+def _utf8_length(lead):
+    if lead >= 0xf0:
+        return 4
+    elif lead >= 0xe0:
+        return 3
+    elif lead >= 0xc0:
+        return 2
+    else:
+        return 1
+
+
+# turns raw terminal input into key events, using the key_* strings of an
+# entry -- this does no I/O, so that it can be driven by KeyReader, or by
+# anything else
+class KeyDecoder(object):
+    def __init__(self, info):
+        self._keys = {}
+
+        for name, seq in info.strings.items():
+            cap = info._cap_info.strings.by_variable_name(name)
+            if cap is None:
+                cap = info._cap_info.strings.by_cap_name(name)
+
+            if seq and cap is not None and \
+                    cap.variable_name.startswith('key_'):
+                self._keys[seq] = name
+
+        # ncurses' extended keys (kUP5, kDC3, etc)
+        for name, seq in (info.extended_strings or {}).items():
+            if seq and name.startswith('k'):
+                self._keys[seq] = name
+
+        # every proper prefix of a key sequence, which means that we can't
+        # tell what we've got until we see more input (or time out)
+        self._prefixes = set()
+        for seq in self._keys:
+            for ind in range(1, len(seq)):
+                self._prefixes.add(seq[:ind])
+
+        self._max_len = max([len(seq) for seq in self._keys] or [0])
+        self._buffer = b''
+
+    @property
+    def pending(self):
+        return bool(self._buffer)
+
+    def _next_event(self, final):
+        buf = self._buffer
+        if not final and buf in self._prefixes:
+            return None
+
+        for length in range(min(self._max_len, len(buf)), 0, -1):
+            name = self._keys.get(buf[:length])
+            if name is not None:
+                self._buffer = buf[length:]
+                return KeyEvent(name, buf[:length])
+
+        length = _utf8_length(bytearray(buf[:1])[0])
+        if length > len(buf):
+            if not final:
+                return None
+
+            length = len(buf)
+
+        self._buffer = buf[length:]
+        return KeyEvent(None, buf[:length])
+
+    def _events(self, final):
+        res = []
+        while self._buffer:
+            event = self._next_event(final)
+            if event is None:
+                break
+
+            res.append(event)
+
+        return res
+
+    def feed(self, data):
+        self._buffer += data
+        return self._events(False)
+
+    # called once no more input has arrived for a while, so that a lone ESC
+    # (for instance) gets reported as such
+    def flush(self):
+        return self._events(True)
+
+
+# reads key events from an asyncio StreamReader attached to a terminal,
+# waiting up to `timeout` seconds for the rest of an ambiguous sequence
+# (e.g. ESC vs. an escape sequence starting with ESC)
+class KeyReader(object):
+    def __init__(self, reader, info, timeout=0.05, read_size=1024):
+        self._reader = reader
+        self._decoder = KeyDecoder(info)
+        self._events = collections.deque()
+        self.timeout = timeout
+        self._read_size = read_size
+
+        # a read which may outlive a call to read_key: timing out (or the
+        # caller getting cancelled) leaves it pending for the next call,
+        # since cancelling it doesn't take effect straight away, and the
+        # StreamReader refuses to start another read in the meantime
+        # (on 3.5 and 3.6)
+        self._read_task = None
+
+    async def read_key(self):
+        while not self._events:
+            if self._read_task is None:
+                self._read_task = asyncio.ensure_future(
+                    self._reader.read(self._read_size))
+
+            timeout = self.timeout if self._decoder.pending else None
+            done, _ = await asyncio.wait({self._read_task}, timeout=timeout)
+            if not done:
+                self._events.extend(self._decoder.flush())
+                continue
+
+            task, self._read_task = self._read_task, None
+            data = task.result()
+
+            if not data:
+                # EOF
+                self._events.extend(self._decoder.flush())
+                if not self._events:
+                    return None
+            else:
+                self._events.extend(self._decoder.feed(data))
+
+        return self._events.popleft()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        res = await self.read_key()
+        if res is None:
+            raise StopAsyncIteration
+
+        return res
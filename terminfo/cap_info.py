@@ -1,13 +1,21 @@
 import os
+import sys
 import pickle
 import logging
-from collections import namedtuple, Sequence
+from collections import namedtuple, OrderedDict, Sequence
 
 
 __all__ = ['CapInfo', 'load_cap_info']
 
+try:
+    intern = sys.intern
+except AttributeError:
+    pass
+
 
 class CapTypeInfo(Sequence):
+    __slots__ = ('_type', '_info', '_aliases', '_by_var_name', '_by_cap_name')
+
     def __init__(self, type, info_list, aliases):
         self._type = type
         self._info = info_list
@@ -41,6 +49,19 @@ class CapTypeInfo(Sequence):
         return ('<Capabilities Sub-Table(%s): '
                 '%s entries>') % (self._type, len(self._info))
 
+    def _memory_footprint(self, seen):
+        res = (sys.getsizeof(self) + sys.getsizeof(self._info) +
+               sys.getsizeof(self._by_var_name) +
+               sys.getsizeof(self._by_cap_name))
+        for info in self._info:
+            res += sys.getsizeof(info)
+            for field in info:
+                if id(field) not in seen:
+                    seen.add(id(field))
+                    res += sys.getsizeof(field)
+
+        return res
+
 
 _CAP_TYPES = {'bool': 'flags', 'num': 'numbers', 'str': 'strings'}
 Capability = namedtuple('Capability', ['number', 'name', 'variable_name',
@@ -81,6 +102,21 @@ class CapInfo(object):
         return (len(self._flags) + len(self._numbers) + len(self._strings) +
                 len(self.aliases['termcap']) + len(self.aliases['terminfo']))
 
+    # an approximate breakdown of the memory used by the table, in bytes
+    # (strings shared between capabilities are only counted once)
+    def memory_footprint(self):
+        seen = set()
+        res = OrderedDict()
+        for type_name in ('flags', 'numbers', 'strings'):
+            res[type_name] = getattr(self, type_name)._memory_footprint(seen)
+
+        res['aliases'] = sum(
+            sys.getsizeof(aliases) + sum(sys.getsizeof(alias)
+                                         for alias in aliases.values())
+            for aliases in self.aliases.values())
+        res['total'] = sum(res.values())
+        return res
+
     def find(self, cap_name=None, variable_name=None):
         if variable_name is not None:
             return (self.flags.by_variable_name(variable_name) or
@@ -95,7 +131,8 @@ class CapInfo(object):
 
     @classmethod
     def loads(cls, content):
-        return cls._load(content.splitlines())
+        # keep the line endings, since load expects lines as read from a file
+        return cls.load(content.splitlines(True))
 
     @classmethod
     def load(cls, content):
@@ -148,10 +185,11 @@ class CapInfo(object):
 
                 type_name = _CAP_TYPES[cap_type]
 
+                # the version strings are repeated across most capabilities
                 info = Capability(counts[type_name], cap_name, var_name,
                                   type_name, tcap_cap_name, key_name,
-                                  key_value, versions, cap_desc.rstrip(),
-                                  in_extensions)
+                                  key_value, intern(versions),
+                                  cap_desc.rstrip(), in_extensions)
 
                 infos[type_name].append(info)
                 counts[type_name] += 1
@@ -1,44 +1,146 @@
+import os
+import sys
+import array
 import struct
 import collections
 import logging
 
-__all__ = ['TermInfo']
+from terminfo.registry import default_registry
+from terminfo.palette import Palette
+
+__all__ = ['TermInfo', 'terminfo_dirs', 'find_terminfo_file']
 
 # the man page uses octal...?
 _MAGIC_NUMBER = 0o432
 # _NEGATIVE_INT is actually 0xffff -- seriously, who specifies *that* in octal?
 _NEGATIVE_INT = 0o377*256 + 0o377
+# ...and _CANCELLED_INT is -2, for capabilities cancelled with "name@"
+_CANCELLED_INT = 0o377*256 + 0o376
+# how missing numbers and strings are stored once parsed
+_ABSENT = -1
+
+# the compact serialization used by TermInfo.to_bytes: a magic string and a
+# version, then the fields described in TermInfo.to_bytes
+_SERIALIZED_MAGIC = b'PyTI'
+_SERIALIZED_VERSION = 1
+_SERIALIZED_HEADER = struct.Struct('<4sBB')
+_SERIALIZED_COUNTS = struct.Struct('<8I')
+_NO_EXTENDED = 0xffffffff
+
+_SERIALIZED_PARSE_EXTENDED = 1 << 0
+_SERIALIZED_USE_VARIABLE_NAMES = 1 << 1
+_SERIALIZED_HAS_EXTENDED = 1 << 2
+
+try:
+    _string_types = basestring
+except NameError:
+    _string_types = str
+
+try:
+    intern = sys.intern
+except AttributeError:
+    pass
+
+_DEFAULT_TERMINFO_DIRS = ['/etc/terminfo', '/lib/terminfo',
+                          '/usr/share/terminfo']
+
+
+# the directories searched for compiled terminfo files, in the same order as
+# ncurses (see the terminfo(5) manpage)
+def terminfo_dirs():
+    res = []
+    if os.environ.get('TERMINFO'):
+        res.append(os.environ['TERMINFO'])
+
+    res.append(os.path.expanduser('~/.terminfo'))
+
+    if os.environ.get('TERMINFO_DIRS'):
+        for terminfo_dir in os.environ['TERMINFO_DIRS'].split(':'):
+            # an empty entry means "the system default"
+            if terminfo_dir:
+                res.append(terminfo_dir)
+            else:
+                res.extend(_DEFAULT_TERMINFO_DIRS)
+
+    res.extend(_DEFAULT_TERMINFO_DIRS)
+
+    seen = set()
+    return [d for d in res if not (d in seen or seen.add(d))]
+
+
+def find_terminfo_file(name, dirs=None):
+    if dirs is None:
+        dirs = terminfo_dirs()
+
+    # entries live under their first letter, or the hex value of their first
+    # letter on case-insensitive filesystems (e.g. OS X)
+    for terminfo_dir in dirs:
+        for sub_dir in (name[0], '%02x' % ord(name[0])):
+            path = os.path.join(terminfo_dir, sub_dir, name)
+            if os.path.isfile(path):
+                return path
+
+    return None
+
+
+# capability values are looked up in `table` by name (either capability or
+# variable name) to find their index
+def _cap_index(table, name):
+    info = table.by_variable_name(name, None)
+    if info is None:
+        info = table.by_cap_name(name, None)
+
+    if info is None:
+        return None
+
+    return info.number
+
+
+def _read_string(string_table, offset):
+    return string_table[offset:string_table.index(b'\0', offset)]
 
 
 class ExtFlagsInfoProxy(collections.Set):
-    def __init__(self, caps):
+    __slots__ = ('_names', '_caps')
+
+    def __init__(self, names, caps):
+        self._names = names
         self._caps = caps
 
     def __contains__(self, flag):
-        return self._caps.get(flag, False)
+        try:
+            return bool(self._caps[self._names.index(flag)])
+        except ValueError:
+            return False
 
     def __iter__(self):
-        for cap, val in self._caps.items():
+        for name, val in zip(self._names, self._caps):
             if not val:
                 continue
             else:
-                yield cap
+                yield name
 
     def __len__(self):
-        return sum(val for val in self._caps.values())
+        return sum(self._caps)
 
     def __repr__(self):
         return '<Extended Capabilites(flags) [%s]>' % (', '.join(self))
 
 
 class FlagsCapInfoProxy(collections.Set):
+    __slots__ = ('_info', '_caps', '_use_variable_names')
+
     def __init__(self, info, caps, use_variable_names=False):
         self._info = info
         self._caps = caps
         self._use_variable_names = use_variable_names
 
     def __contains__(self, flag):
-        return self._caps.get(flag, False)
+        ind = _cap_index(self._info, flag)
+        if ind is None or ind >= len(self._caps):
+            return False
+
+        return bool(self._caps[ind])
 
     def __iter__(self):
         for ind, cap in enumerate(self._caps):
@@ -51,29 +153,42 @@ class FlagsCapInfoProxy(collections.Set):
                     yield self._info[ind].name
 
     def __len__(self):
-        return sum(cap for cap in self._caps)
+        return sum(self._caps)
 
     def __repr__(self):
         return '<Capabilites(flags) [%s]>' % (', '.join(self))
 
 
+# numbers are stored in an array with _ABSENT marking missing values, and
+# strings as offsets into the string table of the entry
 class CapInfoProxy(collections.Mapping):
-    def __init__(self, type, info, caps, use_variable_names=False):
+    __slots__ = ('_info', '_caps', '_type', '_use_variable_names',
+                 '_string_table')
+
+    def __init__(self, type, info, caps, use_variable_names=False,
+                 string_table=None):
         self._info = info
         self._caps = caps
         self._type = type
         self._use_variable_names = use_variable_names
+        self._string_table = string_table
 
-    def __getitem__(self, key):
-        info = self._info.by_variable_name(key, None)
+    def _value(self, raw):
+        if raw == _ABSENT:
+            return None
+        elif self._string_table is None:
+            return raw
+        else:
+            return _read_string(self._string_table, raw)
 
-        if info is None:
-            info = self._info.by_cap_name(key, None)
+    def __getitem__(self, key):
+        ind = _cap_index(self._info, key)
 
-        if info is None:
+        # older entries may stop short of the full table
+        if ind is None or ind >= len(self._caps):
             raise KeyError(key)
 
-        res = self._caps[info.number]
+        res = self._value(self._caps[ind])
         if res is None:
             raise KeyError(key)
         else:
@@ -82,7 +197,7 @@ class CapInfoProxy(collections.Mapping):
     def __iter__(self):
         for ind, cap in enumerate(self._caps):
             # zero or '' are ok
-            if cap is None:
+            if cap == _ABSENT:
                 continue
             else:
                 if self._use_variable_names:
@@ -91,7 +206,7 @@ class CapInfoProxy(collections.Mapping):
                     yield self._info[ind].name
 
     def __len__(self):
-        return sum(cap is not None for cap in self._caps)
+        return sum(cap != _ABSENT for cap in self._caps)
 
     def __repr__(self):
         return '<Capabilites(%s) {%s}>' % (
@@ -100,23 +215,37 @@ class CapInfoProxy(collections.Mapping):
 
 
 class ExtInfoProxy(collections.Mapping):
-    def __init__(self, type, caps):
+    __slots__ = ('_names', '_caps', '_type', '_string_table')
+
+    def __init__(self, type, names, caps, string_table=None):
+        self._names = names
         self._caps = caps
         self._type = type
+        self._string_table = string_table
 
     def __getitem__(self, key):
-        return self._caps[key]
+        try:
+            raw = self._caps[self._names.index(key)]
+        except ValueError:
+            raise KeyError(key)
+
+        if raw == _ABSENT:
+            return None
+        elif self._string_table is None:
+            return raw
+        else:
+            return _read_string(self._string_table, raw)
 
     def __iter__(self):
-        for cap, val in self._caps.items():
+        for name, val in zip(self._names, self._caps):
             # zero or '' are ok
-            if val is None:
+            if val == _ABSENT:
                 continue
             else:
-                yield cap
+                yield name
 
     def __len__(self):
-        return sum(val is not None for val in self._caps.values())
+        return sum(val != _ABSENT for val in self._caps)
 
     def __repr__(self):
         return '<Capabilites(%s) {%s}>' % (
@@ -124,18 +253,80 @@ class ExtInfoProxy(collections.Mapping):
                                   for k, v in self.items()))
 
 
+def _sizeof(*objs):
+    return sum(sys.getsizeof(obj) for obj in objs if obj is not None)
+
+
+def _pack_str(string):
+    raw = string.encode('utf-8')
+    return struct.pack('<H', len(raw)) + raw
+
+
+def _unpack_str(data, ind):
+    size = struct.unpack('<H', data[ind:(ind + 2)])[0]
+    ind += 2
+    return (data[ind:(ind + size)].decode('utf-8'), ind + size)
+
+
+# int arrays are stored as shorts when their values allow it (which they
+# almost always do), prefixed by the size of each value
+def _pack_ints(values):
+    if all(-0x8000 <= val < 0x8000 for val in values):
+        return b'h' + struct.pack('<%sh' % len(values), *values)
+    else:
+        return b'i' + struct.pack('<%si' % len(values), *values)
+
+
+def _unpack_ints(data, ind, count):
+    code = data[ind:(ind + 1)].decode('ascii')
+    ind += 1
+    end = ind + count * struct.calcsize('<' + code)
+    return (array.array('i', struct.unpack('<%s%s' % (count, code),
+                                           data[ind:end])),
+            end)
+
+
+# used when unpickling entries (pickle can't refer to a classmethod on py2)
+def _from_bytes(data):
+    return TermInfo.from_bytes(data)
+
+
+# used when pickling entries whose capabilities table can't be found by name
+# in the default registry
+def _from_bytes_with_table(data, cap_info):
+    return TermInfo.from_bytes(data, cap_info=cap_info)
+
+
 class TermInfo(object):
-    def __init__(self, contents, cap_info, parse_extended=True, use_variable_names=False):
+    # entries are often kept around by the thousand, so avoid the overhead
+    # of a per-instance __dict__
+    __slots__ = ('_parse_extended', '_use_variable_names',
+                 'has_extended_capabilities', 'names', '_flags', '_numbers',
+                 '_strings', '_string_table', '_ext_names', '_ext_flags',
+                 '_ext_numbers', '_ext_strings', '_flags_proxy',
+                 '_numbers_proxy', '_strings_proxy', '_ext_flags_proxy',
+                 '_ext_numbers_proxy', '_ext_strings_proxy', '_palette',
+                 'cap_info_name', '_cap_info', '_registry')
+
+    def __init__(self, contents, cap_info, parse_extended=True,
+                 use_variable_names=False, registry=None):
         self._parse_extended = parse_extended
         self._use_variable_names = use_variable_names
         self.has_extended_capabilities = False
 
         self.names = None
 
+        # flags are a bytearray of 0s and 1s, numbers an array of ints, and
+        # strings an array of offsets into _string_table, which holds all of
+        # the strings of the entry (including the extended ones)
         self._flags = None
         self._numbers = None
         self._strings = None
+        self._string_table = None
 
+        # the names of the extended capabilities, in the order of the
+        # extended flags, then numbers, then strings
+        self._ext_names = None
         self._ext_flags = None
         self._ext_numbers = None
         self._ext_strings = None
@@ -148,6 +339,19 @@ class TermInfo(object):
         self._ext_numbers_proxy = None
         self._ext_strings_proxy = None
 
+        self._palette = None
+
+        # the capabilities table may be given by its name in a registry
+        if registry is None:
+            registry = default_registry
+
+        self._registry = registry
+        if isinstance(cap_info, _string_types):
+            self.cap_info_name = cap_info
+            cap_info = registry.get(cap_info)
+        else:
+            self.cap_info_name = registry.name_of(cap_info)
+
         self._cap_info = cap_info
 
         self._parse(contents)
@@ -156,7 +360,7 @@ class TermInfo(object):
     def _calc_caps_block_size(cls, num_bools, num_numbers, num_strs,
                               str_table_size, start_offset_is_even):
         res = num_bools + (num_numbers + num_strs) * 2 + str_table_size
-        if start_offset_is_even and num_bools % 2 == 1:
+        if (num_bools + (0 if start_offset_is_even else 1)) % 2 == 1:
             res += 1
 
         return res
@@ -195,7 +399,8 @@ class TermInfo(object):
             self._strings_proxy = CapInfoProxy('strings',
                                                self._cap_info.strings,
                                                self._strings,
-                                               self._use_variable_names)
+                                               self._use_variable_names,
+                                               self._string_table)
 
         return self._strings_proxy
 
@@ -205,7 +410,8 @@ class TermInfo(object):
             return None
 
         if self._ext_flags_proxy is None:
-            self._ext_flags_proxy = ExtFlagsInfoProxy(self._ext_flags)
+            self._ext_flags_proxy = ExtFlagsInfoProxy(
+                self._ext_names[:len(self._ext_flags)], self._ext_flags)
 
         return self._ext_flags_proxy
 
@@ -215,8 +421,11 @@ class TermInfo(object):
             return None
 
         if self._ext_numbers_proxy is None:
-            self._ext_numbers_proxy = ExtInfoProxy('numbers',
-                                                   self._ext_numbers)
+            start = len(self._ext_flags)
+            self._ext_numbers_proxy = ExtInfoProxy(
+                'numbers',
+                self._ext_names[start:(start + len(self._ext_numbers))],
+                self._ext_numbers)
 
         return self._ext_numbers_proxy
 
@@ -226,11 +435,193 @@ class TermInfo(object):
             return None
 
         if self._ext_strings_proxy is None:
-            self._ext_strings_proxy = ExtInfoProxy('strings',
-                                                   self._ext_strings)
+            start = len(self._ext_flags) + len(self._ext_numbers)
+            self._ext_strings_proxy = ExtInfoProxy(
+                'strings', self._ext_names[start:], self._ext_strings,
+                self._string_table)
 
         return self._ext_strings_proxy
 
+    @property
+    def palette(self):
+        if self._palette is None:
+            self._palette = Palette(self)
+
+        return self._palette
+
+    # an approximate breakdown of the memory used by the parsed entry, in
+    # bytes (the capabilities table is shared between entries, so it isn't
+    # counted here -- see CapInfo.memory_footprint for that)
+    def memory_footprint(self):
+        res = collections.OrderedDict()
+        res['object'] = sys.getsizeof(self)
+        res['names'] = _sizeof(self.names, *(self.names or []))
+        res['flags'] = _sizeof(self._flags)
+        res['numbers'] = _sizeof(self._numbers)
+        res['strings'] = _sizeof(self._strings, self._string_table)
+        # extended capability names are interned, and thus shared between
+        # entries, so only count the tuple holding them
+        res['extended'] = _sizeof(self._ext_names, self._ext_flags,
+                                  self._ext_numbers, self._ext_strings)
+        res['proxies'] = _sizeof(self._flags_proxy, self._numbers_proxy,
+                                 self._strings_proxy, self._ext_flags_proxy,
+                                 self._ext_numbers_proxy,
+                                 self._ext_strings_proxy)
+        res['total'] = sum(res.values())
+        return res
+
+    # a compact, versioned encoding of the parsed entry, which refers to the
+    # capabilities table by its name in a registry (along with the hash of
+    # its source, if known) instead of embedding it:
+    #
+    #   header: magic, version, option bits
+    #   table name, table hash, names (each a length-prefixed utf-8 string)
+    #   counts: flags, numbers, strings, string table size, then the extended
+    #           flags, numbers, strings, and names size (_NO_EXTENDED if the
+    #           extended capabilities weren't parsed)
+    #   flags (bytes), numbers, string offsets (see _pack_ints),
+    #   string table, then the same for the extended capabilities, followed
+    #   by their NUL-separated names
+    def to_bytes(self, table_name=None, registry=None):
+        if registry is None:
+            registry = self._registry
+
+        if table_name is None:
+            table_name = self.cap_info_name
+
+        if table_name is None:
+            raise ValueError('The capabilities table of %s must be in a '
+                             'registry (or have its name given) in order to '
+                             'serialize it' % self.names[0])
+
+        table_hash = None
+        if table_name in registry and registry.get(table_name) is \
+                self._cap_info:
+            table_hash = registry.content_hash(table_name)
+
+        options = 0
+        if self._parse_extended:
+            options |= _SERIALIZED_PARSE_EXTENDED
+        if self._use_variable_names:
+            options |= _SERIALIZED_USE_VARIABLE_NAMES
+        if self.has_extended_capabilities:
+            options |= _SERIALIZED_HAS_EXTENDED
+
+        if self._ext_names is not None:
+            ext_names = '\0'.join(self._ext_names).encode('utf-8')
+            ext_counts = (len(self._ext_flags), len(self._ext_numbers),
+                          len(self._ext_strings), len(ext_names))
+        else:
+            ext_counts = (_NO_EXTENDED, 0, 0, 0)
+
+        parts = [
+            _SERIALIZED_HEADER.pack(_SERIALIZED_MAGIC, _SERIALIZED_VERSION,
+                                    options),
+            _pack_str(table_name),
+            _pack_str(table_hash or ''),
+            _pack_str('|'.join(self.names)),
+            _SERIALIZED_COUNTS.pack(len(self._flags), len(self._numbers),
+                                    len(self._strings),
+                                    len(self._string_table), *ext_counts),
+            bytes(self._flags),
+            _pack_ints(self._numbers),
+            _pack_ints(self._strings),
+            self._string_table,
+        ]
+
+        if self._ext_names is not None:
+            parts.extend([bytes(self._ext_flags),
+                          _pack_ints(self._ext_numbers),
+                          _pack_ints(self._ext_strings),
+                          ext_names])
+
+        return b''.join(parts)
+
+    # the capabilities table is looked up by name in the registry, unless
+    # it's given explicitly
+    @classmethod
+    def from_bytes(cls, data, cap_info=None, registry=None):
+        if registry is None:
+            registry = default_registry
+
+        magic, version, options = _SERIALIZED_HEADER.unpack(
+            data[:_SERIALIZED_HEADER.size])
+        if magic != _SERIALIZED_MAGIC:
+            raise ValueError('Expected magic %r for a serialized terminfo '
+                             'entry, got %r instead' % (_SERIALIZED_MAGIC,
+                                                        magic))
+
+        if version != _SERIALIZED_VERSION:
+            raise ValueError('Unsupported serialized terminfo entry version '
+                             '%s (expected %s)' % (version,
+                                                   _SERIALIZED_VERSION))
+
+        ind = _SERIALIZED_HEADER.size
+        table_name, ind = _unpack_str(data, ind)
+        table_hash, ind = _unpack_str(data, ind)
+        names, ind = _unpack_str(data, ind)
+
+        if cap_info is None:
+            cap_info = registry.get(table_name)
+            if table_hash and registry.content_hash(table_name) != table_hash:
+                raise ValueError('The capabilities table %s has changed since '
+                                 'the entry was serialized' % table_name)
+
+        res = cls.__new__(cls)
+        for slot in cls.__slots__:
+            setattr(res, slot, None)
+
+        res._parse_extended = bool(options & _SERIALIZED_PARSE_EXTENDED)
+        res._use_variable_names = bool(
+            options & _SERIALIZED_USE_VARIABLE_NAMES)
+        res.has_extended_capabilities = bool(
+            options & _SERIALIZED_HAS_EXTENDED)
+        res.names = names.split('|')
+        res.cap_info_name = table_name or None
+        res._cap_info = cap_info
+        res._registry = registry
+
+        (num_flags, num_numbers, num_strings, table_size, num_ext_flags,
+            num_ext_numbers, num_ext_strings, ext_names_size) = \
+            _SERIALIZED_COUNTS.unpack(
+                data[ind:(ind + _SERIALIZED_COUNTS.size)])
+        ind += _SERIALIZED_COUNTS.size
+
+        res._flags = bytearray(data[ind:(ind + num_flags)])
+        ind += num_flags
+        res._numbers, ind = _unpack_ints(data, ind, num_numbers)
+        res._strings, ind = _unpack_ints(data, ind, num_strings)
+        res._string_table = bytes(data[ind:(ind + table_size)])
+        ind += table_size
+
+        if num_ext_flags != _NO_EXTENDED:
+            res._ext_flags = bytearray(data[ind:(ind + num_ext_flags)])
+            ind += num_ext_flags
+            res._ext_numbers, ind = _unpack_ints(data, ind, num_ext_numbers)
+            res._ext_strings, ind = _unpack_ints(data, ind, num_ext_strings)
+            ext_names = data[ind:(ind + ext_names_size)].decode('utf-8')
+            if ext_names:
+                res._ext_names = tuple(intern(str(name)) for name
+                                       in ext_names.split('\0'))
+            else:
+                res._ext_names = ()
+
+        return res
+
+    def __reduce__(self):
+        # unpickling looks the table up by name in the default registry, so
+        # only refer to it by name if that finds this very table
+        name = self.cap_info_name
+        if name is not None and name in default_registry and \
+                default_registry.is_loaded(name) and \
+                default_registry.get(name) is self._cap_info:
+            return (_from_bytes, (self.to_bytes(registry=default_registry),))
+        else:
+            # the table has to travel with the entry (pickle will still only
+            # store it once per pickled object graph)
+            return (_from_bytes_with_table,
+                    (self.to_bytes(table_name=''), self._cap_info))
+
     def __repr__(self):
         return '<TermInfo(%s): flags#%s, numbers#%s, strings#%s, ext=%s>' % (
             self.names[0], len(self.flags) + len(self.extended_flags or []),
@@ -238,41 +629,41 @@ class TermInfo(object):
             len(self.strings) + len(self.extended_strings or []),
             self.has_extended_capabilities)
 
+    @classmethod
+    def _read_shorts(cls, block, ind, count):
+        # a list of unsigned shorts, with _NEGATIVE_INT representing -1,
+        # which means missing, and _CANCELLED_INT representing -2, which means
+        # cancelled (and is thus also missing)
+        res = array.array('i', struct.unpack('<%sH' % count,
+                                             block[ind:(ind + count * 2)]))
+        for i, val in enumerate(res):
+            if val >= _CANCELLED_INT:
+                res[i] = _ABSENT
+
+        return res
+
     @classmethod
     def _read_caps_block(cls, block, num_bools, num_numbers, num_offsets,
                          str_table_size, start_offset_is_even, num_strs=None):
         ind = 0
         logging.debug('Read %s booleans @ %s' % (num_bools, ind))
-        flags = [b == '\x01' for b in block[ind:(ind + num_bools)]]
+        flags = bytearray(b == 1 for b
+                          in bytearray(block[ind:(ind + num_bools)]))
 
-        # the numbers section always begins on an even byte because PDP-11
+        # the numbers section always begins on an even byte (of the whole
+        # file) because PDP-11
         ind += num_bools
-        if ind % 2 != 0 and start_offset_is_even:
+        if (ind + (0 if start_offset_is_even else 1)) % 2 != 0:
             ind += 1
 
-        # a list of unsigned shorts, with _NEGATIVE_INT representing -1,
-        # which means missing
         logging.debug('Read %s numbers @ %s' % (num_numbers, ind))
-        numbers_raw = struct.unpack('<%sH' % num_numbers,
-                                    block[ind:(ind + (num_numbers * 2))])
-        numbers = [num if num != _NEGATIVE_INT else None
-                   for num in numbers_raw]
+        numbers = cls._read_shorts(block, ind, num_numbers)
 
-        # a list of offsets in the string table, with _NEGATIVE_INT
-        # representing -1, # which means missing
+        # a list of offsets in the string table
         ind += num_numbers * 2
 
         logging.debug('Reading %s offsets @ %s' % (num_offsets, ind))
-        offsets_raw = struct.unpack('<%sH' % num_offsets,
-                                    block[ind:(ind + (num_offsets * 2))])
-
-        offsets = [offset if offset != _NEGATIVE_INT else None
-                   for offset in offsets_raw]
-
-        # for the extended info
-        if num_strs is not None:
-            names_offsets = offsets[num_strs:]
-            offsets = offsets[:num_strs]
+        offsets = cls._read_shorts(block, ind, num_offsets)
 
         # a "table" of null-terminated strings referenced by the offsets above
         ind += num_offsets * 2
@@ -280,26 +671,30 @@ class TermInfo(object):
                                                             ind))
         raw_table = block[ind:(ind + str_table_size)]
 
-        strings = []
-        end_ind = 0
+        if num_strs is None:
+            return (flags, numbers, offsets, raw_table, None)
+
+        # for the extended info, the names follow the strings in the table,
+        # and their offsets are relative to the start of the names
+        names_offsets = offsets[num_strs:]
+        offsets = offsets[:num_strs]
+
+        names_start = 0
         for offset in offsets:
-            if offset is None:
-                strings.append(None)
-            else:
-                end_ind = raw_table.index(b'\0', offset)
-                strings.append(raw_table[offset:end_ind])
+            if offset != _ABSENT:
+                names_start = max(names_start,
+                                  raw_table.index(b'\0', offset) + 1)
 
-        # read the names section
-        if num_strs is not None:
-            names_start = end_ind + 1
-            logging.debug('Reading %s names starting @ %s in the string table'
-                          % (len(names_offsets), names_start))
-            for offset in names_offsets:
-                end_ind = raw_table.index(b'\0', names_start + offset)
-                # we can safely decode these because they're human-readable names
-                strings.append(raw_table[names_start + offset:end_ind].decode())
+        logging.debug('Reading %s names starting @ %s in the string table'
+                      % (len(names_offsets), names_start))
+        names = []
+        for offset in names_offsets:
+            name = _read_string(raw_table, names_start + offset)
+            # we can safely decode these because they're human-readable
+            # names, and they're repeated across many entries
+            names.append(intern(str(name.decode())))
 
-        return (flags, numbers, strings)
+        return (flags, numbers, offsets, raw_table[:names_start], names)
 
     def _parse(self, block):
         # terminfo uses little endian unsigned shorts for lengths and offsets
@@ -325,14 +720,19 @@ class TermInfo(object):
 
         caps_size = self._calc_caps_block_size(
             num_bools, num_numbers, num_strs, str_table_size, ind % 2 == 0)
-        self._flags, self._numbers, self._strings = self._read_caps_block(
-            block[ind:(ind + caps_size)], num_bools, num_numbers, num_strs,
-            str_table_size, ind % 2 == 0)
+        (self._flags, self._numbers, self._strings,
+            self._string_table, _) = self._read_caps_block(
+                block[ind:(ind + caps_size)], num_bools, num_numbers,
+                num_strs, str_table_size, ind % 2 == 0)
 
         if not self._parse_extended:
             return
 
         ind += caps_size
+        # the extended header also starts on an even byte
+        if ind % 2 != 0:
+            ind += 1
+
         if ind < len(block):
             self.has_extended_capabilities = True
             logging.debug('Extended Header @ %s' % ind)
@@ -347,6 +747,13 @@ class TermInfo(object):
                 num_strs_in_ext_table, ext_str_table_size) = struct.unpack(
                     '<5H', block[ind:(ind + 10)])
 
+            # the number of strings in the table doesn't count cancelled
+            # strings (which have no value, but do have an offset and a
+            # name), so the number of offsets has to be worked out from the
+            # other counts: one per string value, and one per name
+            num_ext_offsets = (num_ext_strs + num_ext_bools +
+                               num_ext_numbers + num_ext_strs)
+
             logging.debug('Extended Terminfo Block: bools=%s, nums=%s, '
                           'strs=%s(%s:%s)' % (num_ext_bools, num_ext_numbers,
                                               num_ext_strs,
@@ -355,30 +762,23 @@ class TermInfo(object):
 
             ind += 10
             ext_caps_size = self._calc_caps_block_size(
-                num_ext_bools, num_ext_numbers, num_strs_in_ext_table,
+                num_ext_bools, num_ext_numbers, num_ext_offsets,
                 ext_str_table_size, ind % 2 == 0)
 
-            ext_flags, ext_numbers, all_ext_strings = self._read_caps_block(
-                block[ind:(ind + ext_caps_size)], num_ext_bools,
-                num_ext_numbers, num_strs_in_ext_table,
-                ext_str_table_size, ind % 2 == 0, num_ext_strs)
-
-            ext_strings = all_ext_strings[:num_ext_strs]
-            ext_names = all_ext_strings[num_ext_strs:]
-
-            self._ext_flags = {}
-            names_ind = 0
-            for ind, flag in enumerate(ext_flags):
-                self._ext_flags[ext_names[names_ind + ind]] = flag
-
-            names_ind += len(ext_flags)
-            self._ext_numbers = {}
-            for ind, num in enumerate(ext_numbers):
-                self._ext_numbers[ext_names[names_ind + ind]] = num
-
-            names_ind += len(ext_numbers)
-            self._ext_strings = {}
-            for ind, string in enumerate(ext_strings):
-                self._ext_strings[ext_names[names_ind + ind]] = string
+            (self._ext_flags, self._ext_numbers, ext_strings, ext_table,
+                ext_names) = self._read_caps_block(
+                    block[ind:(ind + ext_caps_size)], num_ext_bools,
+                    num_ext_numbers, num_ext_offsets,
+                    ext_str_table_size, ind % 2 == 0, num_ext_strs)
+
+            # the extended strings share the main string table
+            base = len(self._string_table)
+            for i, offset in enumerate(ext_strings):
+                if offset != _ABSENT:
+                    ext_strings[i] = base + offset
+
+            self._ext_strings = ext_strings
+            self._string_table += ext_table
+            self._ext_names = tuple(ext_names)
 
             ind += ext_caps_size
@@ -0,0 +1,227 @@
+from __future__ import print_function
+
+import os
+import sys
+import logging
+import argparse
+
+from terminfo import core
+from terminfo import cap_info as cap_info_mod
+
+__all__ = ['escape_str', 'wrap', 'format_terminfo', 'iter_terminfo_files',
+           'main']
+
+
+def _build_escape_table():
+    table = []
+    for i in range(256):
+        if i == 0x1b:
+            table.append('\\E')
+        elif i == 0:
+            table.append('\\0')
+        elif i == 0x7f:
+            table.append('\\x7f')
+        elif i < 32:
+            table.append('^' + chr(i + 64))
+        elif i >= 0x80:
+            # octal escapes (as infocmp does), so the output stays ascii
+            table.append('\\%03o' % i)
+        else:
+            table.append(chr(i))
+
+    return table
+
+
+# a single lookup per byte, instead of one replace pass per control character
+_ESCAPE_TABLE = _build_escape_table()
+
+
+def escape_str(input_str):
+    return ''.join([_ESCAPE_TABLE[b] for b in bytearray(input_str)])
+
+
+def wrap(input_items):
+    MAX_LEN = 60
+    line = '\t'
+    res = []
+    for i in input_items:
+        if len(line) + len(i) + 2 < MAX_LEN:
+            line += i + ', '
+        else:
+            if not line.isspace():
+                res.append(line.rstrip())
+            line = '\t' + i + ', '
+
+    res.append(line.rstrip())
+    return '\n'.join(res)
+
+
+def _extension_names(cap_info, use_variable_names):
+    # computed once per capability table, instead of looking up every
+    # capability of every entry in order to filter out the extensions
+    res = {}
+    for type_name in ('flags', 'numbers', 'strings'):
+        table = getattr(cap_info, type_name)
+        if use_variable_names:
+            res[type_name] = frozenset(cap.variable_name for cap in table
+                                       if cap.is_extension)
+        else:
+            res[type_name] = frozenset(cap.name for cap in table
+                                       if cap.is_extension)
+
+    return res
+
+
+def format_terminfo(info, show_extended=False, extension_names=None):
+    if extension_names is None:
+        extension_names = _extension_names(info._cap_info,
+                                           info._use_variable_names)
+
+    named_flags = sorted(info.flags)
+    named_numbers = sorted(info.numbers.items(), key=lambda i: i[0])
+    named_strings = sorted(info.strings.items(), key=lambda i: i[0])
+
+    if show_extended:
+        named_flags.extend(sorted(info.extended_flags or []))
+        named_numbers.extend(sorted((info.extended_numbers or {}).items(),
+                             key=lambda i: i[0]))
+        named_strings.extend(sorted((info.extended_strings or {}).items(),
+                             key=lambda i: i[0]))
+    else:
+        named_flags = [flag for flag in named_flags
+                       if flag not in extension_names['flags']]
+        named_numbers = [(number, v) for number, v in named_numbers
+                         if number not in extension_names['numbers']]
+        named_strings = [(string, v) for string, v in named_strings
+                         if string not in extension_names['strings']]
+
+    return '\n'.join([
+        '|'.join(info.names).rstrip() + ',',
+        wrap(named_flags),
+        wrap('%s#%s' % (name, val)
+             for name, val in named_numbers if val is not None),
+        wrap('%s=%s' % (name, escape_str(val))
+             for name, val in named_strings if val is not None)])
+
+
+def iter_terminfo_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for dir_path, dir_names, file_names in os.walk(path):
+                dir_names.sort()
+                for file_name in sorted(file_names):
+                    yield os.path.join(dir_path, file_name)
+        else:
+            yield path
+
+
+# state for the dumping functions, set up once per process (either directly,
+# or through the worker pool initializer)
+_dump_state = {}
+
+
+def _init_dump_state(cap_info, show_extended, use_variable_names):
+    _dump_state['cap_info'] = cap_info
+    _dump_state['show_extended'] = show_extended
+    _dump_state['use_variable_names'] = use_variable_names
+    _dump_state['extension_names'] = _extension_names(cap_info,
+                                                      use_variable_names)
+
+
+def _dump_file(path):
+    try:
+        with open(path, 'rb') as f:
+            info = core.TermInfo(
+                f.read(), _dump_state['cap_info'],
+                parse_extended=_dump_state['show_extended'],
+                use_variable_names=_dump_state['use_variable_names'])
+
+        return (path, format_terminfo(info, _dump_state['show_extended'],
+                                      _dump_state['extension_names']), None)
+    except Exception as ex:
+        return (path, None, '%s: %s' % (type(ex).__name__, ex))
+
+
+arg_parser = argparse.ArgumentParser(
+    description="Display binary terminfo files (similarly to infocmp from "
+                "ncurses).",
+    epilog="In order to generate a cache file, you must specify a source "
+           "capabilities file.  These files are found in the ncurses source "
+           "under 'include/Caps' and 'include/Caps.*'.  If you specify a "
+           "capabilities file without specifiying a terminfo file, a cache "
+           "will be generated, and the utility will then exit.  Directories "
+           "are searched recursively, and each entry is printed as soon as "
+           "it has been parsed."
+)
+
+arg_parser.add_argument('files', metavar='TERMINFO_FILE', nargs='*',
+                        help='The binary terminfo files (or directories of '
+                             'files) from which to load the information.')
+arg_parser.add_argument('-x', dest='show_extended', action='store_const',
+                        const=True, default=False,
+                        help='Print extended capabilities, similarly to the '
+                             ' -x flag in infocmp from ncurses.')
+arg_parser.add_argument('-L', dest='use_long_names', action='store_const',
+                        const=True, default=False,
+                        help='Use log variable names as printed in term.h')
+arg_parser.add_argument('-j', '--jobs', dest='jobs', metavar='JOBS', type=int,
+                        default=1,
+                        help='The number of worker processes used to parse '
+                             'entries (output order is preserved).')
+arg_parser.add_argument('--cache-file', metavar='CACHE_FILE',
+                        default=os.path.expanduser('~/.py-terminfo-caps-file'),
+                        help='The cache file to use to store the capability '
+                             'names and helps (defaults to '
+                             '~/.py-terminfo-caps-file)')
+arg_parser.add_argument('--caps-file', metavar='CAPS_FILE', default=None,
+                        help='A file containing a capabilities table, '
+                             '(only needed if no cache file is present')
+
+
+def main(argv=None):
+    args = arg_parser.parse_args(argv)
+
+    if not args.files and args.caps_file is None:
+        sys.exit("You must at least specify either a capabilities file "
+                 "or a terminfo file.")
+
+    cap_info = cap_info_mod.load_cap_info(args.caps_file, args.cache_file,
+                                          use_term_h=args.use_long_names)
+
+    if not args.files:
+        return 0
+
+    paths = iter_terminfo_files(args.files)
+    init_args = (cap_info, args.show_extended, args.use_long_names)
+
+    pool = None
+    if args.jobs > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(args.jobs, _init_dump_state, init_args)
+        results = pool.imap(_dump_file, paths, chunksize=16)
+    else:
+        _init_dump_state(*init_args)
+        results = (_dump_file(path) for path in paths)
+
+    failures = 0
+    first = True
+    try:
+        for path, output, error in results:
+            if error is not None:
+                failures += 1
+                logging.error('Unable to load %s: %s' % (path, error))
+                continue
+
+            if not first:
+                sys.stdout.write('\n')
+            first = False
+
+            sys.stdout.write('#\tReconstructed via py-terminfo from file: %s\n'
+                             % path)
+            sys.stdout.write(output + '\n')
+            sys.stdout.flush()
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    return 1 if failures else 0
@@ -0,0 +1,331 @@
+from terminfo.tparm import tparm, strip_padding
+
+
+__all__ = ['Palette', 'STANDOUT', 'UNDERLINE', 'REVERSE', 'BLINK', 'DIM',
+           'BOLD', 'INVISIBLE', 'PROTECTED', 'ALTCHARSET', 'ITALIC']
+
+
+# attributes, in the order of the parameters to 'sgr' (except for italics,
+# which 'sgr' doesn't cover)
+STANDOUT = 1 << 0
+UNDERLINE = 1 << 1
+REVERSE = 1 << 2
+BLINK = 1 << 3
+DIM = 1 << 4
+BOLD = 1 << 5
+INVISIBLE = 1 << 6
+PROTECTED = 1 << 7
+ALTCHARSET = 1 << 8
+ITALIC = 1 << 9
+
+_ATTRIBUTE_CAPS = [
+    (STANDOUT, 'enter_standout_mode'),
+    (UNDERLINE, 'enter_underline_mode'),
+    (REVERSE, 'enter_reverse_mode'),
+    (BLINK, 'enter_blink_mode'),
+    (DIM, 'enter_dim_mode'),
+    (BOLD, 'enter_bold_mode'),
+    (INVISIBLE, 'enter_secure_mode'),
+    (PROTECTED, 'enter_protected_mode'),
+    (ALTCHARSET, 'enter_alt_charset_mode'),
+    (ITALIC, 'enter_italics_mode'),
+]
+
+_SGR_ATTRIBUTES = [STANDOUT, UNDERLINE, REVERSE, BLINK, DIM, BOLD,
+                   INVISIBLE, PROTECTED, ALTCHARSET]
+
+# the xterm defaults for the 16 basic colours
+_ANSI_COLORS = [
+    (0, 0, 0), (205, 0, 0), (0, 205, 0), (205, 205, 0),
+    (0, 0, 238), (205, 0, 205), (0, 205, 205), (229, 229, 229),
+    (127, 127, 127), (255, 0, 0), (0, 255, 0), (255, 255, 0),
+    (92, 92, 255), (255, 0, 255), (0, 255, 255), (255, 255, 255),
+]
+
+# the legacy 'setf'/'setb' capabilities swap red and blue compared to the
+# ANSI colour order used by 'setaf'/'setab'
+_LEGACY_ORDER = [0, 4, 2, 6, 1, 5, 3, 7]
+
+# the levels of the colour cube and grey ramp in xterm's 256 and 88 colour
+# palettes
+_CUBE_LEVELS = {256: [0, 95, 135, 175, 215, 255],
+                88: [0, 139, 205, 255]}
+_GREY_LEVELS = {256: [8 + 10 * i for i in range(24)],
+                88: [46, 92, 115, 139, 162, 185, 208, 231]}
+
+# how many truecolor sequences to remember before starting over
+_MAX_MEMO_SIZE = 65536
+
+
+def _nearest_levels(levels):
+    # a table mapping each channel value to the index of the nearest level
+    return [min(range(len(levels)), key=lambda i: abs(levels[i] - val))
+            for val in range(256)]
+
+
+def _distance(a, b):
+    return ((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2)
+
+
+def _unpack_rgb(color):
+    if isinstance(color, tuple):
+        return color
+
+    return ((color >> 16) & 0xff, (color >> 8) & 0xff, color & 0xff)
+
+
+def _pack_rgb(color):
+    if isinstance(color, tuple):
+        return (color[0] << 16) | (color[1] << 8) | color[2]
+
+    return color
+
+
+# the colour model and precomputed colour and attribute sequences of a
+# terminal, worked out once from its capabilities
+class Palette(object):
+    def __init__(self, info):
+        numbers = info.numbers
+        strings = info.strings
+        ext_flags = info.extended_flags or frozenset()
+        ext_numbers = info.extended_numbers or {}
+        ext_strings = info.extended_strings or {}
+
+        self.colors = numbers.get('max_colors') or 0
+        self.pairs = numbers.get('max_pairs') or 0
+
+        set_fg = strings.get('set_a_foreground')
+        set_bg = strings.get('set_a_background')
+        order = None
+        if set_fg is None and set_bg is None:
+            set_fg = strings.get('set_foreground')
+            set_bg = strings.get('set_background')
+            order = _LEGACY_ORDER
+
+        has_rgb_flag = ('RGB' in ext_flags or 'RGB' in ext_numbers or
+                        'RGB' in ext_strings)
+
+        # how truecolor values get sent to the terminal, if at all
+        self._set_rgb_fg = None
+        self._set_rgb_bg = None
+        self._packed_rgb = False
+        if 'setrgbf' in ext_strings or 'setrgbb' in ext_strings:
+            self._set_rgb_fg = ext_strings.get('setrgbf')
+            self._set_rgb_bg = ext_strings.get('setrgbb')
+        elif has_rgb_flag and self.colors >= 1 << 24:
+            # ncurses' direct colour entries take a packed RGB value
+            self._set_rgb_fg = set_fg
+            self._set_rgb_bg = set_bg
+            self._packed_rgb = True
+        elif 'Tc' in ext_flags:
+            # tmux's convention for terminals supporting the ISO-8613-6
+            # sequences, without actually saying what they are
+            self._set_rgb_fg = b'\x1b[38;2;%p1%d;%p2%d;%p3%dm'
+            self._set_rgb_bg = b'\x1b[48;2;%p1%d;%p2%d;%p3%dm'
+
+        if self._set_rgb_fg is not None or self._set_rgb_bg is not None:
+            self.model = 'truecolor'
+        elif self.colors >= 256:
+            self.model = 256
+        elif self.colors >= 88:
+            self.model = 88
+        elif self.colors >= 16:
+            self.model = 16
+        elif self.colors >= 8:
+            self.model = 8
+        elif self.colors > 0:
+            self.model = self.colors
+        else:
+            self.model = None
+
+        # the indexed colours, which truecolor values are downsampled to when
+        # the terminal can't display them directly
+        if self._packed_rgb:
+            num_indexed = 8
+        else:
+            num_indexed = min(self.colors, 256)
+
+        self.foreground = self._build_colors(set_fg, num_indexed, order)
+        self.background = self._build_colors(set_bg, num_indexed, order)
+
+        if num_indexed >= 256:
+            self._indexed_model = 256
+        elif num_indexed >= 88:
+            self._indexed_model = 88
+        else:
+            self._indexed_model = num_indexed
+
+        self._nearest_cube = None
+        if self._indexed_model in _CUBE_LEVELS:
+            self._nearest_cube = _nearest_levels(
+                _CUBE_LEVELS[self._indexed_model])
+            self._nearest_grey = _nearest_levels(
+                _GREY_LEVELS[self._indexed_model])
+
+        self.reset = strip_padding(strings.get('exit_attribute_mode') or b'')
+        self.attributes = self._build_attributes(strings)
+
+        self._fg_memo = {}
+        self._bg_memo = {}
+
+    @staticmethod
+    def _build_colors(cap, num_colors, order):
+        if cap is None:
+            return []
+
+        res = []
+        for ind in range(num_colors):
+            if order is not None and ind < len(order):
+                ind = order[ind]
+
+            res.append(strip_padding(tparm(cap, ind)))
+
+        return res
+
+    def _build_attributes(self, strings):
+        sgr = strings.get('set_attributes')
+
+        self.supported_attributes = 0
+        enter_caps = {}
+        for attr, cap_name in _ATTRIBUTE_CAPS:
+            cap = strings.get(cap_name)
+            if cap is not None:
+                self.supported_attributes |= attr
+                enter_caps[attr] = strip_padding(cap)
+
+        # every combination of the supported attributes, each starting from
+        # a reset of all attributes
+        res = {}
+        mask = self.supported_attributes
+        combination = mask
+        while True:
+            if sgr is not None:
+                seq = strip_padding(tparm(sgr, *[
+                    int(bool(combination & attr))
+                    for attr in _SGR_ATTRIBUTES]))
+                if combination & ITALIC:
+                    seq += enter_caps[ITALIC]
+            else:
+                seq = self.reset + b''.join(
+                    enter_caps[attr] for attr, _ in _ATTRIBUTE_CAPS
+                    if combination & attr)
+
+            res[combination] = seq
+
+            if combination == 0:
+                break
+
+            combination = (combination - 1) & mask
+
+        # a plain reset is usually shorter than 'sgr' with no attributes
+        if self.reset:
+            res[0] = self.reset
+
+        return res
+
+    def __repr__(self):
+        return '<Palette(%s): attributes#%s>' % (self.model,
+                                                 len(self.attributes))
+
+    def attribute_sequence(self, attrs):
+        return self.attributes[attrs & self.supported_attributes]
+
+    def rgb_to_index(self, color):
+        if not self.foreground and not self.background:
+            return None
+
+        rgb = _unpack_rgb(color)
+        num_colors = max(len(self.foreground), len(self.background))
+
+        res = min(range(min(num_colors, 16)),
+                  key=lambda i: _distance(rgb, _ANSI_COLORS[i]))
+
+        if self._nearest_cube is not None:
+            cube_levels = _CUBE_LEVELS[self._indexed_model]
+            size = len(cube_levels)
+            r, g, b = [self._nearest_cube[c] for c in rgb]
+            cube_ind = 16 + (r * size + g) * size + b
+            cube_rgb = (cube_levels[r], cube_levels[g], cube_levels[b])
+
+            grey_levels = _GREY_LEVELS[self._indexed_model]
+            grey = self._nearest_grey[(rgb[0] + rgb[1] + rgb[2]) // 3]
+            grey_ind = 16 + size ** 3 + grey
+            grey_rgb = (grey_levels[grey],) * 3
+
+            best = _distance(rgb, _ANSI_COLORS[res])
+            for ind, candidate in ((cube_ind, cube_rgb),
+                                   (grey_ind, grey_rgb)):
+                dist = _distance(rgb, candidate)
+                if dist < best:
+                    res, best = ind, dist
+
+        return res
+
+    @staticmethod
+    def _indexed_sequence(table, ind, kind):
+        # terminals without colour (or without a way to set this one) just
+        # don't get a colour sequence, as with truecolor values
+        if not table:
+            return b''
+
+        if not 0 <= ind < len(table):
+            raise ValueError('%s colour %s is out of range (the terminal has '
+                             '%s colours)' % (kind, ind, len(table)))
+
+        return table[ind]
+
+    def sequence(self, fg=None, bg=None, attrs=0):
+        # fg and bg may be colour indices, or (r, g, b) tuples -- attributes
+        # come first, since resetting them resets the colours on most
+        # terminals
+        res = self.attribute_sequence(attrs)
+
+        if isinstance(fg, tuple):
+            res += self.rgb_sequences([fg])[0]
+        elif fg is not None:
+            res += self._indexed_sequence(self.foreground, fg, 'Foreground')
+
+        if isinstance(bg, tuple):
+            res += self.rgb_sequences([bg], True)[0]
+        elif bg is not None:
+            res += self._indexed_sequence(self.background, bg, 'Background')
+
+        return res
+
+    def rgb_sequences(self, colors, background=False):
+        # map many (r, g, b) tuples (or 0xRRGGBB ints) to sequences at once,
+        # remembering the results for colours seen before
+        if background:
+            memo = self._bg_memo
+            table = self.background
+            set_rgb = self._set_rgb_bg
+        else:
+            memo = self._fg_memo
+            table = self.foreground
+            set_rgb = self._set_rgb_fg
+
+        if len(memo) > _MAX_MEMO_SIZE:
+            memo.clear()
+
+        res = []
+        for color in colors:
+            packed = _pack_rgb(color)
+            seq = memo.get(packed)
+            if seq is None:
+                if set_rgb is not None:
+                    if self._packed_rgb:
+                        seq = tparm(set_rgb, packed)
+                    else:
+                        seq = tparm(set_rgb, *_unpack_rgb(packed))
+
+                    seq = strip_padding(seq)
+                elif table:
+                    seq = table[self.rgb_to_index(packed)]
+                else:
+                    seq = b''
+
+                memo[packed] = seq
+
+            res.append(seq)
+
+        return res
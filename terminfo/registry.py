@@ -0,0 +1,207 @@
+import os
+import pickle
+import hashlib
+import logging
+import tempfile
+import threading
+
+from terminfo.cap_info import CapInfo, LimittedCapInfo
+
+
+__all__ = ['CapInfoRegistry', 'default_registry']
+
+
+_DEFAULT_CACHE_DIR = '~/.py-terminfo-caps-cache'
+
+# the cache directory is shared by every interpreter, so stick to a pickle
+# protocol that python 2.7 can read
+_CACHE_PROTOCOL = 2
+
+# the kind of source determines which class is used to parse it, so it forms
+# part of the cache key along with the content hash
+_SOURCE_KINDS = {'caps': CapInfo, 'term_h': LimittedCapInfo}
+
+
+class _Source(object):
+    def __init__(self, kind, path=None, cap_info=None):
+        self.kind = kind
+        self.path = path
+        self.cap_info = cap_info
+        self.content_hash = None
+
+
+# a set of named capabilities tables (e.g. from 'include/Caps' and
+# 'include/Caps.aix4' in the ncurses source), loaded lazily on first use and
+# cached on disk under the hash of their source file's contents, so that
+# several tables can be cached side by side
+class CapInfoRegistry(object):
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = os.path.expanduser(_DEFAULT_CACHE_DIR)
+
+        self.cache_dir = cache_dir
+
+        self._sources = {}
+        # tables with identical contents are shared between names
+        self._by_hash = {}
+        self._lock = threading.RLock()
+
+    def register(self, name, caps_file=None, term_h=None, cache_file=None,
+                 cap_info=None):
+        if sum(arg is not None
+               for arg in (caps_file, term_h, cache_file, cap_info)) != 1:
+            raise ValueError('You must specify exactly one of a capabilities '
+                             'table file, a term.h file, a cache file, or a '
+                             'loaded capabilities table.')
+
+        with self._lock:
+            if caps_file is not None:
+                self._sources[name] = _Source('caps', path=caps_file)
+            elif term_h is not None:
+                self._sources[name] = _Source('term_h', path=term_h)
+            elif cache_file is not None:
+                # an existing cache, as written by load_cap_info
+                self._sources[name] = _Source('cache', path=cache_file)
+            else:
+                self._sources[name] = _Source(None, cap_info=cap_info)
+
+    def unregister(self, name):
+        with self._lock:
+            del self._sources[name]
+
+    # drop loaded tables (all of them if no name is given), so that they get
+    # reloaded from their source files on next use
+    def invalidate(self, name=None):
+        with self._lock:
+            if name is None:
+                sources = list(self._sources.values())
+            else:
+                sources = [self._sources[name]]
+
+            for source in sources:
+                if source.path is None:
+                    continue
+
+                self._by_hash.pop((source.kind, source.content_hash), None)
+                source.cap_info = None
+                source.content_hash = None
+
+    def source_path(self, name):
+        return self._sources[name].path
+
+    def content_hash(self, name):
+        with self._lock:
+            self.get(name)
+            return self._sources[name].content_hash
+
+    def is_loaded(self, name):
+        return self._sources[name].cap_info is not None
+
+    def name_of(self, cap_info):
+        for name, source in list(self._sources.items()):
+            if source.cap_info is cap_info:
+                return name
+
+        return None
+
+    def get(self, name):
+        source = self._sources[name]
+        # fast path: no locking once a table has been loaded
+        res = source.cap_info
+        if res is not None:
+            return res
+
+        with self._lock:
+            if source.cap_info is None:
+                self._load(source)
+
+            return source.cap_info
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def __contains__(self, name):
+        return name in self._sources
+
+    def __iter__(self):
+        return iter(list(self._sources))
+
+    def __len__(self):
+        return len(self._sources)
+
+    def __repr__(self):
+        return '<Capabilities Table Registry: %s (%s loaded)>' % (
+            ', '.join(sorted(self._sources)),
+            sum(source.cap_info is not None
+                for source in self._sources.values()))
+
+    def _cache_path(self, kind, content_hash):
+        return os.path.join(self.cache_dir,
+                            '%s-%s.pickle' % (kind, content_hash))
+
+    def _load(self, source):
+        # everything below works from this one read, so that a file changing
+        # underneath us can't get cached under the hash of its old contents
+        with open(source.path, 'rb') as f:
+            content = f.read()
+
+        content_hash = hashlib.sha1(content).hexdigest()
+
+        res = self._by_hash.get((source.kind, content_hash))
+        if res is None and source.kind == 'cache':
+            res = pickle.loads(content)
+            self._by_hash[(source.kind, content_hash)] = res
+        elif res is None:
+            cache_path = self._cache_path(source.kind, content_hash)
+            if os.path.exists(cache_path):
+                logging.debug('Loading capabilities table %s from cache %s'
+                              % (source.path, cache_path))
+                res = self._read_cache(cache_path)
+
+            if res is None:
+                logging.debug('Parsing capabilities table %s' % source.path)
+                if not isinstance(content, str):
+                    content = content.decode('utf-8')
+
+                res = _SOURCE_KINDS[source.kind].loads(content)
+                self._write_cache(cache_path, res)
+
+            self._by_hash[(source.kind, content_hash)] = res
+
+        source.content_hash = content_hash
+        source.cap_info = res
+
+    def _read_cache(self, cache_path):
+        # a cache we can't use (unreadable, truncated, written by a newer
+        # python, etc) just gets treated as a miss, and then rewritten
+        try:
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+        except Exception as ex:
+            logging.warn('Unable to read capabilities cache %s: %s'
+                         % (cache_path, ex))
+            return None
+
+    def _write_cache(self, cache_path, cap_info):
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+
+            # write to a temporary file and rename it into place, so that
+            # concurrent readers never see a partially-written cache
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir,
+                                            suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(cap_info, f, _CACHE_PROTOCOL)
+
+            # mkstemp only lets the owner read the file, but the cache may
+            # be shared with other users
+            os.chmod(tmp_path, 0o644)
+
+            os.rename(tmp_path, cache_path)
+        except (IOError, OSError) as ex:
+            logging.warn('Unable to write capabilities cache %s: %s'
+                         % (cache_path, ex))
+
+
+default_registry = CapInfoRegistry()
@@ -0,0 +1,190 @@
+import re
+
+
+__all__ = ['tparm', 'strip_padding']
+
+
+# static variables (%PA-%PZ) persist between calls, as in ncurses
+_static_vars = {}
+
+_PADDING_RE = re.compile(br'\$<[0-9.]+[*/]*>')
+
+_PERCENT = ord('%')
+_FORMAT_CHARS = frozenset(bytearray(b':-+# .0123456789doxXs'))
+
+_BINARY_OPS = {
+    ord('+'): lambda a, b: a + b,
+    ord('-'): lambda a, b: a - b,
+    ord('*'): lambda a, b: a * b,
+    ord('/'): lambda a, b: int(float(a) / b) if b else 0,
+    ord('m'): lambda a, b: (abs(a) % abs(b)) * (1 if a >= 0 else -1)
+    if b else 0,
+    ord('&'): lambda a, b: a & b,
+    ord('|'): lambda a, b: a | b,
+    ord('^'): lambda a, b: a ^ b,
+    ord('='): lambda a, b: int(a == b),
+    ord('<'): lambda a, b: int(a < b),
+    ord('>'): lambda a, b: int(a > b),
+    ord('A'): lambda a, b: int(bool(a and b)),
+    ord('O'): lambda a, b: int(bool(a or b)),
+}
+
+
+def strip_padding(string):
+    return _PADDING_RE.sub(b'', string)
+
+
+def _skip(string, ind, stop_at_else):
+    # skip forward past the matching '%e' (if stop_at_else) or '%;',
+    # taking nested conditionals into account
+    level = 0
+    end = len(string)
+    while ind < end:
+        if string[ind] != _PERCENT:
+            ind += 1
+            continue
+
+        ind += 1
+        if ind >= end:
+            break
+
+        op = string[ind]
+        ind += 1
+        if op == ord('?'):
+            level += 1
+        elif op == ord(';'):
+            if level == 0:
+                return ind
+
+            level -= 1
+        elif op == ord('e') and level == 0 and stop_at_else:
+            return ind
+
+    return ind
+
+
+# evaluate a parameterized string (such as 'setaf' or 'cup'), as described
+# in the "Parameterized Strings" section of the terminfo(5) manpage
+def tparm(string, *params):
+    if string is None:
+        return None
+
+    string = bytearray(string)
+    params = list(params) + [0] * (9 - len(params))
+    dynamic_vars = {}
+    stack = []
+    out = bytearray()
+
+    def pop():
+        return stack.pop() if stack else 0
+
+    def pop_int():
+        val = pop()
+        if isinstance(val, (bytes, bytearray)):
+            return 0
+
+        return int(val)
+
+    ind = 0
+    end = len(string)
+    while ind < end:
+        char = string[ind]
+        ind += 1
+        if char != _PERCENT:
+            out.append(char)
+            continue
+
+        if ind >= end:
+            break
+
+        op = string[ind]
+        ind += 1
+
+        if op == _PERCENT:
+            out.append(_PERCENT)
+        elif op == ord('c'):
+            # like ncurses, send NUL as \200, since it would otherwise
+            # terminate the string
+            out.append(pop_int() & 0xff or 0o200)
+        elif op == ord('p') and ind < end and \
+                ord('1') <= string[ind] <= ord('9'):
+            stack.append(params[string[ind] - ord('1')])
+            ind += 1
+        elif op == ord('P') and ind < end:
+            var = string[ind]
+            ind += 1
+            if ord('a') <= var <= ord('z'):
+                dynamic_vars[var] = pop()
+            else:
+                _static_vars[var] = pop()
+        elif op == ord('g') and ind < end:
+            var = string[ind]
+            ind += 1
+            if ord('a') <= var <= ord('z'):
+                stack.append(dynamic_vars.get(var, 0))
+            else:
+                stack.append(_static_vars.get(var, 0))
+        elif op == ord("'") and ind < end:
+            stack.append(string[ind])
+            # skip the character and the closing quote
+            ind += 2
+        elif op == ord('{') and string.find(b'}', ind) != -1:
+            close_ind = string.find(b'}', ind)
+            digits = bytes(string[ind:close_ind])
+            stack.append(int(digits) if digits.isdigit() else 0)
+            ind = close_ind + 1
+        elif op == ord('l'):
+            val = pop()
+            stack.append(len(val) if isinstance(val, (bytes, bytearray))
+                         else 0)
+        elif op in _BINARY_OPS:
+            b = pop_int()
+            a = pop_int()
+            stack.append(_BINARY_OPS[op](a, b))
+        elif op == ord('!'):
+            stack.append(int(not pop_int()))
+        elif op == ord('~'):
+            stack.append(~pop_int())
+        elif op == ord('i'):
+            for param_ind in (0, 1):
+                if not isinstance(params[param_ind], (bytes, bytearray)):
+                    params[param_ind] += 1
+        elif op == ord('?') or op == ord(';'):
+            pass
+        elif op == ord('t'):
+            if not pop_int():
+                ind = _skip(string, ind, True)
+        elif op == ord('e'):
+            ind = _skip(string, ind, False)
+        elif op in _FORMAT_CHARS:
+            # a printf-style format: %[[:]flags][width[.precision]][doxXs]
+            start = ind - 1
+            while op not in bytearray(b'doxXs') and ind < end:
+                op = string[ind]
+                ind += 1
+
+            if op not in bytearray(b'doxXs'):
+                # an unterminated format, so pass it through
+                out.append(_PERCENT)
+                out.extend(string[start:])
+                break
+
+            spec = bytes(string[start:(ind - 1)]).decode('ascii')
+            spec = '%' + spec.lstrip(':')
+            if op == ord('s'):
+                val = pop()
+                if not isinstance(val, (bytes, bytearray)):
+                    val = str(val).encode('ascii')
+
+                out.extend(((spec + 's') % val.decode('latin-1'))
+                           .encode('latin-1'))
+            else:
+                out.extend(((spec + chr(op)) % pop_int()).encode('ascii'))
+        else:
+            # pass through anything we don't understand (such as the
+            # "%[...]" response pattern in xterm's u8, or a truncated
+            # operation) untouched, like ncurses
+            out.append(_PERCENT)
+            out.append(op)
+
+    return bytes(out)
@@ -0,0 +1,523 @@
+import os
+import errno
+import select
+import struct
+import logging
+import threading
+
+from terminfo import core
+from terminfo.registry import default_registry
+
+
+__all__ = ['TermInfoCache', 'Watcher']
+
+
+# a cache of parsed terminfo entries by terminal name -- lookups never touch
+# the filesystem once an entry has been loaded, so a Watcher is needed to pick
+# up changes to the terminfo database
+class TermInfoCache(object):
+    def __init__(self, cap_info, dirs=None, registry=None,
+                 **term_info_kwargs):
+        if dirs is None:
+            dirs = core.terminfo_dirs()
+
+        if registry is None:
+            registry = default_registry
+
+        self.dirs = [os.path.normpath(d) for d in dirs]
+        self.cap_info = cap_info
+        self.registry = registry
+        self._term_info_kwargs = term_info_kwargs
+
+        # name --> TermInfo (or None if no entry was found)
+        self._entries = {}
+        # name --> (path, stat key when loaded), for polling
+        self._paths = {}
+        # bumped on every invalidation, so that loads which race with an
+        # invalidation don't store stale results
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def __getitem__(self, name):
+        res = self._entries.get(name, self)
+        if res is self:
+            res = self._load(name)
+
+        if res is None:
+            raise KeyError(name)
+
+        return res
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __len__(self):
+        return sum(entry is not None for entry in self._entries.values())
+
+    def __repr__(self):
+        return '<TermInfo Cache: %s entries>' % len(self)
+
+    def _load(self, name):
+        generation = self._generation
+
+        path = core.find_terminfo_file(name, self.dirs)
+        if path is None:
+            res = None
+        else:
+            with open(path, 'rb') as f:
+                stat_key = _stat_key_of(os.fstat(f.fileno()))
+                res = core.TermInfo(f.read(), self.cap_info,
+                                    registry=self.registry,
+                                    **self._term_info_kwargs)
+
+        with self._lock:
+            if self._generation == generation:
+                self._entries[name] = res
+                if path is not None:
+                    self._paths[name] = (path, stat_key)
+
+        return res
+
+    def invalidate(self, name=None):
+        with self._lock:
+            self._generation += 1
+            if name is None:
+                self._entries.clear()
+                self._paths.clear()
+            else:
+                self._entries.pop(name, None)
+                self._paths.pop(name, None)
+
+    # called with the path of a changed file in one of the terminfo
+    # directories -- an entry shadowing one in a later directory counts as a
+    # change to that entry, so this goes by name rather than by exact path
+    def invalidate_path(self, path):
+        sub_dir = os.path.dirname(path)
+        if os.path.dirname(sub_dir) not in self.dirs:
+            return False
+
+        name = os.path.basename(path)
+        if name in self._entries:
+            self.invalidate(name)
+
+        return True
+
+    # called when a whole sub-directory (e.g. 'x') of one of the terminfo
+    # directories was created, removed, or may have missed events
+    def invalidate_sub_dir(self, sub_dir):
+        if os.path.dirname(sub_dir) not in self.dirs:
+            return False
+
+        letter = os.path.basename(sub_dir)
+        for name in list(self._entries):
+            if letter in (name[0], '%02x' % ord(name[0])):
+                self.invalidate(name)
+
+        return True
+
+    # the files behind the loaded entries, with their stat keys at load time
+    def loaded_paths(self):
+        return list(self._paths.values())
+
+    def invalidate_cap_info(self, cap_info_name):
+        if self.cap_info == cap_info_name:
+            self.invalidate()
+
+
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM |
+               _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF |
+               _IN_MOVE_SELF)
+
+# struct inotify_event, not including the variable-length name
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _load_libc():
+    import ctypes
+    import ctypes.util
+
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                       use_errno=True)
+
+    # this raises AttributeError on platforms without inotify
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                       ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+
+    return libc, ctypes
+
+
+# the callbacks run on the watcher thread, where an exception would silently
+# end it (leaving the caches stale from then on), so a change which can't be
+# handled gets treated like missed events instead, invalidating everything
+def _dispatch(callback, path, is_dir):
+    try:
+        callback(path, is_dir)
+    except Exception:
+        logging.exception('Unable to handle a change to %s' % path)
+        if path is None:
+            return
+
+        try:
+            callback(None, False)
+        except Exception:
+            logging.exception('Unable to invalidate the terminfo caches')
+
+
+class _InotifyBackend(object):
+    def __init__(self, callback):
+        self._libc, self._ctypes = _load_libc()
+        self._callback = callback
+
+        self._fd = self._libc.inotify_init1(_IN_CLOEXEC)
+        if self._fd < 0:
+            err = self._ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+        self._wake_read, self._wake_write = os.pipe()
+        self._watches = {}
+
+    def watch(self, path, is_dir):
+        # files are usually replaced by renaming a new file into place, so
+        # watch the containing directory rather than the file itself
+        if not is_dir:
+            path = os.path.dirname(path)
+
+        if path in self._watches.values():
+            return True
+
+        if hasattr(os, 'fsencode'):
+            raw_path = os.fsencode(path)
+        else:
+            raw_path = path
+
+        wd = self._libc.inotify_add_watch(self._fd, raw_path, _WATCH_MASK)
+        if wd < 0:
+            err = self._ctypes.get_errno()
+            if err not in (errno.ENOENT, errno.ENOTDIR):
+                # e.g. EACCES, or ENOSPC once we run out of watches -- this
+                # only affects the one directory, so carry on without it
+                logging.warn('Unable to watch %s: %s'
+                             % (path, os.strerror(err)))
+
+            return False
+
+        self._watches[wd] = path
+        return True
+
+    def run(self, stop_event):
+        while not stop_event.is_set():
+            readable, _, _ = select.select([self._fd, self._wake_read],
+                                           [], [])
+            if self._wake_read in readable:
+                break
+
+            try:
+                data = os.read(self._fd, 65536)
+            except OSError as ex:
+                if ex.errno == errno.EINTR:
+                    continue
+
+                raise
+
+            ind = 0
+            while ind < len(data):
+                wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, ind)
+                ind += _EVENT_HEADER.size
+                name = data[ind:(ind + name_len)].rstrip(b'\0')
+                ind += name_len
+
+                if mask & _IN_Q_OVERFLOW:
+                    _dispatch(self._callback, None, False)
+                    continue
+
+                watch_path = self._watches.get(wd)
+                if watch_path is None:
+                    continue
+
+                if mask & _IN_IGNORED:
+                    del self._watches[wd]
+                    continue
+
+                if name:
+                    path = os.path.join(watch_path, name.decode())
+                else:
+                    path = watch_path
+
+                _dispatch(self._callback, path, bool(mask & _IN_ISDIR))
+
+    def wake(self):
+        os.write(self._wake_write, b'\0')
+
+    def close(self):
+        for fd in (self._fd, self._wake_read, self._wake_write):
+            os.close(fd)
+
+
+def _stat_key_of(st):
+    return (getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size, st.st_ino)
+
+
+def _stat_key(path):
+    try:
+        return _stat_key_of(os.stat(path))
+    except OSError:
+        return None
+
+
+class _PollingBackend(object):
+    def __init__(self, callback, interval, loaded_paths=None):
+        self._callback = callback
+        self._interval = interval
+        # path --> (stat key, is_dir)
+        self._paths = {}
+        # returns (path, stat key when loaded) for files whose contents are
+        # cached -- rewriting a file in place doesn't change the mtime of its
+        # directory, so these need checking as well
+        self._loaded_paths = loaded_paths
+
+    def watch(self, path, is_dir):
+        key = _stat_key(path)
+        if key is None and is_dir:
+            return False
+
+        self._paths[path] = (key, is_dir)
+        return True
+
+    def run(self, stop_event):
+        while not stop_event.wait(self._interval):
+            for path, (old_key, is_dir) in list(self._paths.items()):
+                new_key = _stat_key(path)
+                if new_key == old_key:
+                    continue
+
+                self._paths[path] = (new_key, is_dir)
+                if is_dir:
+                    self._changed_dir(path)
+                else:
+                    _dispatch(self._callback, path, False)
+
+            if self._loaded_paths is not None:
+                for path, old_key in self._loaded_paths():
+                    if _stat_key(path) != old_key:
+                        _dispatch(self._callback, path, False)
+
+    def _changed_dir(self, path):
+        # a directory's mtime changes whenever entries are added, removed or
+        # replaced, but we can't tell which ones
+        _dispatch(self._callback, path, True)
+
+        try:
+            names = os.listdir(path)
+        except OSError:
+            return
+
+        for name in names:
+            child = os.path.join(path, name)
+            if child not in self._paths and os.path.isdir(child):
+                _dispatch(self._callback, child, True)
+
+    def wake(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# watches the terminfo directories used by a set of TermInfoCaches (and the
+# source files of the tables in a CapInfoRegistry), invalidating only the
+# affected cached objects when something changes.  inotify is used where
+# available, with a polling fallback elsewhere
+class Watcher(object):
+    def __init__(self, caches=(), registry=None, use_inotify=None,
+                 interval=1.0):
+        if registry is None:
+            registry = default_registry
+
+        self.caches = list(caches)
+        self.registry = registry
+        self._interval = interval
+        self._thread = None
+        self._stop_event = threading.Event()
+
+        # the backend is created on every start (and closed on stop), so
+        # that an unstarted watcher doesn't hold on to any file descriptors
+        self._backend = None
+        self._use_inotify = use_inotify
+        self.using_inotify = False
+        if use_inotify is None or use_inotify:
+            try:
+                _load_libc()
+                self.using_inotify = True
+            except (OSError, AttributeError) as ex:
+                if use_inotify:
+                    raise
+
+                logging.debug('inotify unavailable (%s), falling back to '
+                              'polling' % ex)
+        self._table_paths = {}
+        # terminfo directories which don't exist (yet) -- the nearest
+        # existing parent of each gets watched instead, so that we notice
+        # e.g. the first run of tic creating ~/.terminfo
+        self._missing_dirs = set()
+
+    def _create_backend(self):
+        if self.using_inotify:
+            try:
+                return _InotifyBackend(self._changed)
+            except OSError as ex:
+                # e.g. EMFILE, once we're out of inotify instances
+                if self._use_inotify:
+                    raise
+
+                logging.warn('Unable to use inotify (%s), falling back to '
+                             'polling' % ex)
+                self.using_inotify = False
+
+        return _PollingBackend(self._changed, self._interval,
+                               self._loaded_paths)
+
+    def _loaded_paths(self):
+        res = []
+        for cache in self.caches:
+            res.extend(cache.loaded_paths())
+
+        return res
+
+    def _watch_dir(self, path):
+        return self._backend.watch(path, True)
+
+    def _watch_terminfo_dir(self, terminfo_dir):
+        if not self._watch_dir(terminfo_dir):
+            self._missing_dirs.add(terminfo_dir)
+            parent = os.path.dirname(terminfo_dir)
+            while parent != os.path.dirname(parent) and \
+                    not os.path.isdir(parent):
+                parent = os.path.dirname(parent)
+
+            self._watch_dir(parent)
+            return
+
+        self._missing_dirs.discard(terminfo_dir)
+        try:
+            sub_dirs = os.listdir(terminfo_dir)
+        except OSError:
+            sub_dirs = []
+
+        for sub_dir in sub_dirs:
+            sub_dir = os.path.join(terminfo_dir, sub_dir)
+            if os.path.isdir(sub_dir):
+                self._watch_dir(sub_dir)
+                # entries may have been written before we started watching
+                for cache in self.caches:
+                    cache.invalidate_sub_dir(sub_dir)
+
+    def _watch_all(self):
+        dirs = set()
+        for cache in self.caches:
+            dirs.update(cache.dirs)
+
+        self._missing_dirs = set()
+        for terminfo_dir in dirs:
+            self._watch_terminfo_dir(terminfo_dir)
+
+        self._table_paths = {}
+        for name in self.registry:
+            path = self.registry.source_path(name)
+            if path is None:
+                continue
+
+            path = os.path.abspath(path)
+            self._table_paths.setdefault(path, []).append(name)
+            self._backend.watch(path, False)
+
+    def _check_missing_dirs(self, path):
+        for terminfo_dir in list(self._missing_dirs):
+            if terminfo_dir == path or \
+                    terminfo_dir.startswith(path.rstrip(os.sep) + os.sep):
+                # either it now exists, or one more of its parents does
+                self._watch_terminfo_dir(terminfo_dir)
+
+    def _changed(self, path, is_dir):
+        if path is None:
+            # we may have missed events, so start from scratch
+            logging.debug('Missed filesystem events, invalidating all caches')
+            for cache in self.caches:
+                cache.invalidate()
+
+            self.registry.invalidate()
+            return
+
+        if self._missing_dirs:
+            self._check_missing_dirs(path)
+
+        for table_name in self._table_paths.get(path, []):
+            logging.debug('Capabilities table %s changed' % table_name)
+            self.registry.invalidate(table_name)
+            for cache in self.caches:
+                cache.invalidate_cap_info(table_name)
+
+        for cache in self.caches:
+            if path in cache.dirs and not os.path.isdir(path):
+                # the whole terminfo directory went away, so wait for it to
+                # come back
+                self._watch_terminfo_dir(path)
+            elif is_dir:
+                if cache.invalidate_sub_dir(path):
+                    self._watch_dir(path)
+            else:
+                cache.invalidate_path(path)
+
+    def start(self):
+        if self._thread is not None:
+            return
+
+        if self._backend is None:
+            self._backend = self._create_backend()
+
+        self._watch_all()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._backend.run,
+                                        args=(self._stop_event,),
+                                        name='terminfo-watcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+
+        self._stop_event.set()
+        self._backend.wake()
+        self._thread.join()
+        self._thread = None
+        self._backend.close()
+        self._backend = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()